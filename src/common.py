@@ -1,16 +1,29 @@
 import json
 import os
+import threading
 from time import time
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 import requests
 import re
-from config import DEBUG_LOCAL_TEST, I14Y_USER_AGENT, PROXIES
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import CA_BUNDLE, DEBUG_LOCAL_TEST, I14Y_USER_AGENT, ORGANIZATION_ID, PROXIES
+
+# Seconds before its announced expiry at which the access token is refreshed
+TOKEN_EXPIRY_MARGIN = 30
+
+# Tokens kept in memory for the other API objects of the same run, (token url, client key) -> (token, expires at)
+_TOKEN_CACHE: Dict[Tuple[str, str], Tuple[str, float]] = {}
 
 
 def reauth_if_token_expired(func):
     """Decorator to reauth before rerunning function if token is expired"""
 
     def wrap_func(self, *args, **kwargs):
+        # A token about to expire is replaced before the call instead of after a 401
+        if time() >= self.api_token_expires_at:
+            self.refresh_access_token(self.api_token)
         try:
             return func(self, *args, **kwargs)
         except requests.HTTPError as e:
@@ -18,12 +31,39 @@ def reauth_if_token_expired(func):
             print(url)
             print(f"API error: {e.response.status_code} - {e.response.text}")
             if e.response.status_code == 401:
-                self.api_token = self.get_access_token()
+                expired_token = e.request.headers.get("Authorization") if e.request is not None else None
+                self.refresh_access_token(expired_token)
             return func(self, *args, **kwargs)
 
     return wrap_func
 
 
+def api_params_from_env() -> Dict[str, str]:
+    """Build the api_params expected by CommonI14YAPI from the env vars set by the github workflow"""
+    return {
+        "client_key": os.environ["CLIENT_KEY"],
+        "client_secret": os.environ["CLIENT_SECRET"],
+        "api_get_token_url": os.environ["GET_TOKEN_URL"],
+        "api_base_url": os.environ["API_BASE_URL"],
+        "organization_id": ORGANIZATION_ID,
+    }
+
+
+def create_session() -> requests.Session:
+    """Create a session with the User-Agent, TLS and proxy settings shared by all API calls and downloads"""
+    session = requests.Session()
+    session.headers["User-Agent"] = I14Y_USER_AGENT
+
+    if DEBUG_LOCAL_TEST:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        session.verify = False
+        session.proxies = PROXIES
+    else:
+        # True makes requests verify against the certifi bundle
+        session.verify = CA_BUNDLE or True
+    return session
+
+
 def timer(func):
     """Decorator that shows the execution time of the function object passed"""
 
@@ -59,14 +99,15 @@ class CommonI14YAPI:
             self.client_secret = api_params["client_secret"]
             self.bfs_identifier_pattern = re.compile(r"^\d+(-[a-z]+)?@bundesamt-fur-statistik-bfs$")
             self.datasets_file_path = os.path.join(os.getcwd(), "OGD_OFS", "data", "datasets.json")
-            self.session = requests.Session()
-
-            if DEBUG_LOCAL_TEST:
-                self.session.verify = False
-                self.session.proxies = PROXIES
+            self.session = self._create_session()
+            # Worker threads share the token, the lock makes sure that only one of them refreshes it
+            self._token_lock = threading.Lock()
+            # The harvester and the structure importer it starts use the same credentials, so the token is reused
+            cached_token = _TOKEN_CACHE.get((self.api_get_token_url, self.client_key))
+            if cached_token and time() < cached_token[1]:
+                self.api_token, self.api_token_expires_at = cached_token
             else:
-                self.session.verify = True
-            self.api_token = self.get_access_token()
+                self.api_token = self.get_access_token()
         except (KeyError, TypeError):
             exception_str = "You need to provide the following parameters in a dict:"
             exception_str += "\n- client_key: client key to generate token"
@@ -76,18 +117,45 @@ class CommonI14YAPI:
             exception_str += "\n- organization: i14y organization"
             raise Exception(exception_str)
 
+    def _create_session(self) -> requests.Session:
+        """Create the session used for all API calls, keeping connections alive between calls"""
+        session = create_session()
+        # Retries only apply to the I14Y API, other hosts called with this session handle their own retries.
+        # POST isn't retried on status since it is not idempotent.
+        # On 429 and 503 the wait follows the Retry-After header when the API sends one
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504], raise_on_status=False
+            ),
+        )
+        session.mount(self.api_base_url, adapter)
+        return session
+
     def get_access_token(self):
         """Generated an access token from client key and client secret"""
         data = {"grant_type": "client_credentials"}
         response = self.session.post(
             self.api_get_token_url,
             data=data,
-            verify=False,
             auth=(self.client_key, self.client_secret),
         )
         if response.status_code >= 400:
             raise Exception("Failed to get token")
-        return "Bearer " + response.json()["access_token"]
+        token = response.json()
+        # The token is considered expired a little early so that it doesn't expire during a call
+        expires_in = token.get("expires_in")
+        self.api_token_expires_at = time() + expires_in - TOKEN_EXPIRY_MARGIN if expires_in else float("inf")
+        api_token = "Bearer " + token["access_token"]
+        _TOKEN_CACHE[(self.api_get_token_url, self.client_key)] = (api_token, self.api_token_expires_at)
+        return api_token
+
+    def refresh_access_token(self, expired_token: Optional[str] = None) -> None:
+        """Get a new token, unless another thread already replaced the expired one"""
+        with self._token_lock:
+            if expired_token is None or expired_token == self.api_token:
+                self.api_token = self.get_access_token()
 
     @reauth_if_token_expired
     def get_all_existing_datasets(self, publisherIdentifier: str, pageSize: int = 25) -> str:
@@ -98,9 +166,10 @@ class CommonI14YAPI:
         all_datasets = []
 
         url = f"{self.api_base_url}/datasets"
-        headers = {"Authorization": self.api_token, "Accept": "application/json", "User-Agent": I14Y_USER_AGENT}
+        headers = {"Authorization": self.api_token, "Accept": "application/json"}
         i = 1
         has_more = True
+        match_bfs_identifier = self.bfs_identifier_pattern.match
 
         while has_more:
             params = {
@@ -108,12 +177,12 @@ class CommonI14YAPI:
                 "pageSize": pageSize,
                 "page": i,
             }
-            response = self.session.get(url, params=params, headers=headers, verify=False)
+            response = self.session.get(url, params=params, headers=headers)
             response.raise_for_status()
             data = response.json()
             for dataset in data["data"]:
-                identifier = dataset["identifiers"][0]
-                if self.bfs_identifier_pattern.match(identifier):
+                identifiers = dataset.get("identifiers")
+                if identifiers and match_bfs_identifier(identifiers[0]):
                     all_datasets.append(dataset)
 
             i += 1
@@ -24,8 +24,16 @@ I14Y_USER_AGENT = "I14Y FSO Harvester (contact: i14y@bfs.admin.ch)"
 
 DEBUG_LOCAL_TEST = os.environ.get("DEBUG_LOCAL_TEST", "false") == "true"
 PROXIES = {"http": "http://proxy-bvcol.admin.ch:8080", "https": "http://proxy-bvcol.admin.ch:8080"}
+# Path to a CA bundle for hosts signed by a private CA, the certifi bundle is used otherwise
+CA_BUNDLE = os.environ.get("CA_BUNDLE")
 
 MAX_WORKERS = 1
 
+# Structure imports are independent per dataset and can run in parallel, they run one at a time unless set higher
+STRUCTURE_MAX_WORKERS = int(os.environ.get("STRUCTURE_MAX_WORKERS", "1"))
+
+# Downloaded PX metadata is cached here and revalidated with ETag/Last-Modified on the next run
+PX_CACHE_DIR = os.environ.get("PX_CACHE_DIR", os.path.join(os.getcwd(), ".cache", "px"))
+
 # Useful when e.g. we have to change the parsing of the description
 UPDATE_ALL = os.environ.get("UPDATE_ALL", "false") == "true"
\ No newline at end of file
@@ -17,6 +17,11 @@ ADMS = Namespace("http://www.w3.org/ns/adms#")
 SPDX = Namespace("http://spdx.org/rdf/terms#")
 dcat3 = Namespace("http://www.w3.org/ns/dcat#")
 
+# Compiled once, they are used for every keyword and relation of every dataset
+_WHITESPACE_RE = re.compile(r"\s+")
+_RELATION_SEPARATOR_RE = re.compile(r";\s+")
+
+
 def extract_dataset(graph, dataset_uri):
     """Extracts dataset details from RDF graph."""
 
@@ -327,7 +332,7 @@ def _normalize_theme_keyword(value):
     value = unicodedata.normalize("NFKD", str(value))
     value = "".join(ch for ch in value if not unicodedata.combining(ch))
     value = value.lower().strip()
-    value = re.sub(r"\s+", " ", value)
+    value = _WHITESPACE_RE.sub(" ", value)
     return value
 
 
@@ -484,7 +489,7 @@ def get_relations(graph, subject):
     for obj in graph.objects(subject, DCTERMS.relation):
         original_uri = str(obj)
         
-        potential_uris = re.split(r';\s+', original_uri.strip('; \t\n\r'))
+        potential_uris = _RELATION_SEPARATOR_RE.split(original_uri.strip('; \t\n\r'))
         
         for uri in potential_uris:
             uri = uri.strip()
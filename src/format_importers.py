@@ -3,20 +3,93 @@ Format-specific importers - simple classes for different file formats
 """
 
 import datetime
+import functools
+import json
 import re
+import threading
 import os
 import csv
 import io
 from urllib.parse import urlparse
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import chardet
-import urllib
+import requests
+from requests.adapters import HTTPAdapter
+from common import create_session
+from config import PX_CACHE_DIR
+
+# Patterns compiled once at import, they are used for every distribution and PX file
+# PX identifier, searched in access URLs and matched against whole file names
+_PX_ID_RE = re.compile(r"px-x-\d+_\d+", re.IGNORECASE)
+# TITLE, DESCRIPTION, STUB and HEADING are extracted in a single scan of the PX content,
+# keywords start a line and their value may span several lines. The value is quoted strings
+# joined by "," or line breaks, spelled out without lazy quantifiers so that an unterminated
+# value stops at the next quote instead of backtracking over the rest of the file
+_PX_KEYWORD_RE = re.compile(
+    r'^(?P<keyword>TITLE|DESCRIPTION|STUB|HEADING)(?:\[(?P<lang>\w+)\])?="(?P<value>[^"]*(?:"\s*,?\s*"[^"]*)*)";',
+    re.MULTILINE,
+)
+# Separator between the quoted values of a PX list, which may span several lines
+_PX_LIST_SEPARATOR_RE = re.compile(r'"\s*,\s*"')
+# Long PX strings are continued on the next line as another quoted string without a comma, the pieces are joined.
+# The line break is required so that an empty list element ("") is not mistaken for a continuation
+_PX_CONTINUATION_RE = re.compile(r'"[ \t]*\r?\n[ \t]*"')
+_CLEAN_NAME_RE = re.compile(r"[^\w\s]")
+# Decimal number with "." or "," as separator and an optional exponent (values are lowercased),
+# the fractional digits and the exponent are captured
+_NUMBER_RE = re.compile(r"[+-]?(?=[.,]?\d)\d*(?:[.,](\d*))?(e[+-]?\d+)?")
+# Shape shared by all DATE_FORMATS, values that don't fit it are rejected without trying strptime
+_DATE_SHAPE_RE = re.compile(r"\d{4}[-/][ \d]?\d[-/][ \d]?\d|[ \d]?\d[/.][ \d]?\d[/.]\d\d(?:\d\d)?")
+_PX_DATA_RE = re.compile(rb"^DATA\s*=", re.MULTILINE)
+_PX_CODEPAGE_RE = re.compile(rb'CODEPAGE="([\w.:-]+)";')
+
+# Version of the cached PX metadata, to bump whenever parse_px_content changes its output so that the old
+# cache entries are parsed again instead of being served on a 304
+PX_CACHE_VERSION = 3
+
+
+def _create_session() -> requests.Session:
+    """Create the session shared by all importers, so that downloads reuse pooled keep-alive connections"""
+    session = create_session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=3)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = _create_session()
+
+
+@functools.lru_cache(maxsize=1024)
+def _camel_case(name: str, default: str) -> str:
+    """Convert to camelCase, cached since the same labels come back for every language and file"""
+    words = _CLEAN_NAME_RE.sub("", name).split()
+    if not words:
+        return default
+
+    result = words[0].lower() + "".join(word.capitalize() for word in words[1:])
+
+    return result or default
+
+
+def _extend_dimensions(dimensions: List[Dict[str, str]], count: int) -> None:
+    """Extend the per-dimension label dicts in one step, the first language usually declares all dimensions"""
+    if len(dimensions) < count:
+        dimensions.extend({} for _ in range(count - len(dimensions)))
+
+
+def _split_px_list(values_str: str) -> List[str]:
+    """Split the inside of a PX list keyword (e.g. a","b",\n"c) into its non-empty values"""
+    # The regex captures strip the outer quotes, PX strings can't contain quotes so splitting on "," is enough
+    return [value for value in map(str.strip, _PX_LIST_SEPARATOR_RE.split(values_str)) if value]
 
 
 class FormatImporter:
     """Common functions for all importers"""
 
     YEAR_KEYWORDS = {"jahr", "year", "année", "annee", "anno"}
+    # Single alternation so that names are scanned once instead of once per keyword
+    YEAR_KEYWORDS_RE = re.compile("|".join(map(re.escape, sorted(YEAR_KEYWORDS))), re.IGNORECASE)
     DATE_FORMATS = [
         "%Y-%m-%d",
         "%d/%m/%Y",
@@ -27,20 +100,32 @@ class FormatImporter:
     ]
     BOOLEAN_TRUE = {"1", "oui", "ja", "si"}
     BOOLEAN_FALSE = {"0", "non", "nein", "no"}
+    BOOLEAN_VALUES = BOOLEAN_TRUE | BOOLEAN_FALSE
 
     def get_access_url(self, distribution: Dict) -> Optional[str]:
         """Get access URL from distribution"""
-        if isinstance(distribution.get("accessUrl"), dict):
-            return distribution["accessUrl"].get("uri")  # Extract 'uri' field
-        elif isinstance(distribution.get("downloadUrl"), dict):
-            return distribution["downloadUrl"].get("uri")  # Extract 'uri' field
-        else:
-            # Return accessUrl or downloadUrl directly if they are strings
-            return distribution.get("accessUrl") or distribution.get("downloadUrl")
+        access_url = distribution.get("accessUrl")
+        if isinstance(access_url, dict):
+            return access_url.get("uri")  # Extract 'uri' field
+        download_url = distribution.get("downloadUrl")
+        if isinstance(download_url, dict):
+            return download_url.get("uri")  # Extract 'uri' field
+        # Return accessUrl or downloadUrl directly if they are strings
+        return access_url or download_url
+
+    def is_year_name(self, name: str) -> bool:
+        """Check if a dimension or column name refers to years"""
+        return self.YEAR_KEYWORDS_RE.search(name) is not None
 
     def decode_content(self, raw_content: bytes):
+        # Most files are UTF-8, a strict decode confirms it much faster than charset detection.
+        # utf-8-sig also drops the BOM like the detected UTF-8-SIG encoding did
+        try:
+            return raw_content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            pass
+
         detected_encoding = chardet.detect(raw_content)["encoding"]
-        print(f"Detected encoding: {detected_encoding}")  # Debugging: Log detected encoding
 
         # Decode content using detected encoding
         try:
@@ -63,7 +148,10 @@ class PXImporter(FormatImporter):
             return False
 
         clean_url = access_url.split("?")[0].split("#")[0]
-        return bool(re.search(r"px-x-\d+_\d+", clean_url, re.IGNORECASE))
+        # Most distributions are not PX files, a plain substring check rejects them without running the regex
+        if "px-x-" not in clean_url.lower():
+            return False
+        return bool(_PX_ID_RE.search(clean_url))
 
     def get_identifier(self, distribution: Dict) -> Optional[str]:
         """Get unique identifier for this file"""
@@ -71,117 +159,178 @@ class PXImporter(FormatImporter):
         if not access_url or not isinstance(access_url, str):
             return None  # Ensure access_url is a string
 
-        path = urlparse(access_url).path
-        basename = os.path.basename(path)
-
-        if "." in basename:
-            basename = basename.split(".")[0]
+        # File name without extension(s), e.g. px-x-0102020000_101 for .../px-x-0102020000_101.px
+        basename = urlparse(access_url).path.rpartition("/")[2].partition(".")[0]
 
-        # Ensure the identifier matches the expected pattern
-        if re.match(r"px-x-\d+_\d+", basename.lower()):
-            return str(basename)  # Ensure it's a string
+        # Ensure the identifier matches the expected pattern, the whole name and in any case
+        if _PX_ID_RE.fullmatch(basename):
+            return basename
         return None
 
-    def download_and_parse(self, distribution: Dict, first_n_bytes: int = 1024**2) -> Dict:
-        """Download PX file and extract metadata"""
-        px_id = self.get_identifier(distribution)
+    def download_and_parse(
+        self, distribution: Dict, chunk_size: int = 64 * 1024, identifier: Optional[str] = None
+    ) -> Dict:
+        """Download PX file and extract metadata, identifier can be passed if get_identifier was already called"""
+        px_id = identifier or self.get_identifier(distribution)
         if not px_id:
             raise Exception("Could not extract PX identifier")
 
         # Download file
         url = f"https://www.pxweb.bfs.admin.ch/DownloadFile.aspx?file={px_id}"
 
-        not_enough_bytes = True
+        # The parsed metadata is cached with the validators of the download, an unchanged file is neither decoded nor parsed
+        cache_path = os.path.join(PX_CACHE_DIR, f"{px_id}.json")
+        cached = self._load_cached_metadata(cache_path)
 
-        while not_enough_bytes:
+        raw_content, validators = self.fetch_px_metadata(px_id, url, chunk_size, cached)
+        if raw_content is None:
+            return cached["metadata"]
 
-            # We download only the first megabyte of data
-            raw_content = urllib.request.urlopen(url).read(first_n_bytes)
+        # No line ending normalization needed: continued strings are joined by dropping the line break (LF or CRLF)
+        # and the quotes around it, and lists are split on "," with the surrounding whitespace
+        px_content = self.decode_px_content(raw_content)
 
-            px_content = self.decode_content(raw_content)
+        # Parse metadata
+        metadata = self.parse_px_content(px_content, px_id)
 
-            px_content = px_content.replace("\r\n", "\n").replace("\r", "\n")
+        # Without validators we could never revalidate the cached copy, so there is no point in storing it
+        if validators["etag"] or validators["last_modified"]:
+            os.makedirs(PX_CACHE_DIR, exist_ok=True)
+            cache_entry = {"version": PX_CACHE_VERSION, **validators, "metadata": metadata}
+            self._write_atomically(cache_path, json.dumps(cache_entry).encode("utf-8"))
 
-            match = re.search(r"DATA\s*=\s*(.*)", px_content, re.DOTALL)
-            # We check if DATA= is present
-            not_enough_bytes = "DATA=" not in px_content
+        return metadata
 
-            if not_enough_bytes:
-                first_n_bytes *= 2
-                print(
-                    f"DEBUG PXImporter: not enough bytes downloaded, DATA= not detected, first_n_bytes increased to {first_n_bytes}"
-                )
+    @staticmethod
+    def _load_cached_metadata(cache_path: str) -> Optional[Dict]:
+        """Load a cache entry, an unreadable entry or one written by another parser version counts as a miss"""
+        try:
+            with open(cache_path, "r", encoding="utf-8") as file:
+                cached = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable PX cache file {cache_path}: {e}")
+            return None
 
-        # Parse metadata
-        return self.parse_px_content(px_content, px_id)
+        if not isinstance(cached, dict) or cached.get("version") != PX_CACHE_VERSION or "metadata" not in cached:
+            return None
+        return cached
+
+    def fetch_px_metadata(
+        self, px_id: str, url: str, chunk_size: int, cached: Optional[Dict] = None
+    ) -> Tuple[Optional[bytes], Dict]:
+        """
+        Download the metadata part of a PX file, revalidating the cached copy if there is one.
+
+        Returns:
+            Tuple[Optional[bytes], Dict]: (raw metadata bytes or None if the cached copy is still valid, dict with etag and last_modified)
+        """
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with SESSION.get(url, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code == 304 and cached:
+                print(f"PX file {px_id} not modified, using cached metadata")
+                return None, {"etag": cached.get("etag"), "last_modified": cached.get("last_modified")}
+            response.raise_for_status()
+
+            # The metadata keywords precede DATA=, so we stream the file only until DATA= is reached
+            raw_content = bytearray()
+            data_match = None
+            for chunk in response.iter_content(chunk_size):
+                # Search only the new bytes, with a small overlap in case DATA= is split between two chunks
+                search_start = max(len(raw_content) - 16, 0)
+                raw_content += chunk
+                data_match = _PX_DATA_RE.search(raw_content, search_start)
+                if data_match:
+                    break
+            validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+        if data_match:
+            del raw_content[data_match.start() :]
+        else:
+            print(f"Warning: DATA= not detected in PX file {px_id}, parsing the whole file")
+
+        return bytes(raw_content), validators
+
+    @staticmethod
+    def _write_atomically(file_path: str, content: bytes) -> None:
+        """Write to a temporary file first so that concurrent readers never see a partial file"""
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(content)
+        os.replace(tmp_path, file_path)
+
+    def decode_px_content(self, raw_content: bytes) -> str:
+        """Decode PX content without running charset detection on the whole file when possible"""
+        try:
+            return raw_content.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+
+        # Non UTF-8 PX files declare their encoding in the CODEPAGE keyword (e.g. iso-8859-15)
+        match = _PX_CODEPAGE_RE.search(raw_content)
+        if match:
+            try:
+                return raw_content.decode(match.group(1).decode("ascii"))
+            except (UnicodeDecodeError, LookupError):
+                pass
+
+        return self.decode_content(raw_content)
 
     def parse_px_content(self, px_content: str, px_id: str) -> Dict:
         """Parse PX file content"""
         data = {"identifier": px_id, "title": {}, "description": {}, "properties": []}
 
-        lines = px_content
+        stub_dimensions = []
+        heading_dimensions = []
 
-        # Extract TITLE
-        for match in re.finditer(r'TITLE(?:\[(\w+)\])?="(.*?)";', lines, re.DOTALL):
-            lang = match.group(1) or "de"
-            data["title"][lang] = match.group(2).strip()
+        # The metadata keywords precede DATA=, the data section is not scanned
+        data_start = px_content.find("\nDATA=")
+        metadata_end = data_start if data_start != -1 else len(px_content)
 
-        # Extract DESCRIPTION
-        for match in re.finditer(r'DESCRIPTION(?:\[(\w+)\])?="(.*?)";', lines, re.DOTALL):
-            lang = match.group(1) or "de"
-            data["description"][lang] = match.group(2).strip()
+        # Single pass over the metadata with one combined regex, dispatched on the keyword
+        for match in _PX_KEYWORD_RE.finditer(px_content, 0, metadata_end):
+            keyword = match.group("keyword")
+            lang = match.group("lang") or "de"
+            value = _PX_CONTINUATION_RE.sub("", match.group("value"))
 
-        # Extract STUB dimensions
-        stub_dimensions = []
-        for match in re.finditer(r'STUB(?:\[(\w+)\])?="(.*?)";', lines, re.DOTALL):
-            lang = match.group(1) or "de"
-            dimensions_str = match.group(2)
-
-            dimensions = []
-            parts = dimensions_str.split('","')
-            for part in parts:
-                clean_part = part.strip().strip('"')
-                if clean_part:
-                    dimensions.append(clean_part)
-
-            for i, dim in enumerate(dimensions):
-                while len(stub_dimensions) <= i:
-                    stub_dimensions.append({})
-                if lang not in stub_dimensions[i]:
-                    stub_dimensions[i][lang] = dim
-
-        # Extract HEADING dimensions
-        heading_dimensions = []
-        for match in re.finditer(r'HEADING(?:\[(\w+)\])?="(.*?)";', lines, re.DOTALL):
-            lang = match.group(1) or "de"
-            dimensions_str = match.group(2)
+            if keyword == "TITLE":
+                data["title"][lang] = value.strip()
 
-            parts = dimensions_str.split('","')
-            dimensions = []
-            for part in parts:
-                clean_part = part.strip().strip('"')
-                if clean_part:
-                    dimensions.append(clean_part)
+            elif keyword == "DESCRIPTION":
+                data["description"][lang] = value.strip()
 
-            for i, dim in enumerate(dimensions):
-                while len(heading_dimensions) <= i:
-                    heading_dimensions.append({})
-                heading_dimensions[i][lang] = dim
+            elif keyword == "STUB":
+                dimensions = _split_px_list(value)
+                _extend_dimensions(stub_dimensions, len(dimensions))
+                for dim_labels, dim in zip(stub_dimensions, dimensions):
+                    dim_labels.setdefault(lang, dim)
 
+            elif keyword == "HEADING":
+                dimensions = _split_px_list(value)
+                _extend_dimensions(heading_dimensions, len(dimensions))
+                for dim_labels, dim in zip(heading_dimensions, dimensions):
+                    dim_labels[lang] = dim
 
         # Convert to properties format
         for dim_data in stub_dimensions:
             if dim_data:
                 first_name = next(iter(dim_data.values()))
                 prop_name = self.clean_property_name(first_name)
-                is_year = any(keyword in first_name.lower() for keyword in self.YEAR_KEYWORDS)
+                is_year = self.is_year_name(first_name)
                 data["properties"].append({"name": prop_name, "labels": dim_data, "datatype": "gYear" if is_year else "string"})
 
         for dim_data in heading_dimensions:
             if dim_data:
                 first_name = next(iter(dim_data.values()))
                 prop_name = self.clean_property_name(first_name)
-                is_year = any(keyword in first_name.lower() for keyword in self.YEAR_KEYWORDS)
+                is_year = self.is_year_name(first_name)
                 data["properties"].append(
                     {"name": prop_name, "labels": dim_data, "datatype": "gYear" if is_year else "string"}
                 )
@@ -190,21 +339,15 @@ class PXImporter(FormatImporter):
 
     def clean_property_name(self, name: str) -> str:
         """Convert to camelCase property name"""
-        name = re.sub(r"[^\w\s]", "", name)
-        words = name.split()
-        if not words:
-            return "property"
-
-        result = words[0].lower()
-        for word in words[1:]:
-            result += word.capitalize()
-
-        return result or "property"
+        return _camel_case(name, "property")
 
 
 class CSVImporter(FormatImporter):
     """Handles CSV file operations"""
 
+    # Number of rows used to infer the column datatypes
+    SAMPLE_ROWS = 50
+
     def can_process(self, distribution: Dict) -> bool:
         """Check if this distribution is a CSV file"""
         format_info = distribution.get("format", {})
@@ -259,31 +402,41 @@ class CSVImporter(FormatImporter):
             identifier = access_url.split("/")[-2].split("?")[0]
         return str(identifier) if identifier else None
 
-    def download_and_parse(self, distribution: Dict, first_n_bytes: int = 1024**2) -> Dict:
-        """Download CSV file and extract structure"""
+    def download_and_parse(
+        self,
+        distribution: Dict,
+        chunk_size: int = 64 * 1024,
+        identifier: Optional[str] = None,
+        max_bytes: int = 1024**2,
+    ) -> Dict:
+        """Download CSV file and extract structure, identifier can be passed if get_identifier was already called"""
         access_url = self.get_access_url(distribution)
         if not access_url:
             raise Exception("No access URL found")
 
-        identifier = self.get_identifier(distribution)
-
-        not_enough_bytes = True
-
-        while not_enough_bytes:
-
-            # We download only the first megabyte of data
-            raw_content = urllib.request.urlopen(access_url).read(first_n_bytes)
-
-            content = self.decode_content(raw_content)
-
-            content = content.replace("\r\n", "\n").replace("\r", "\n")
-
-            not_enough_bytes = len([line for line in content.split("\n") if line.strip() != ""]) < 2
-            if not_enough_bytes:
-                first_n_bytes *= 2
-                print(
-                    f"DEBUG CSVImporter: not enough bytes downloaded, \\n not detected, first_n_bytes increased to {first_n_bytes}"
-                )
+        identifier = identifier or self.get_identifier(distribution)
+
+        # Only the header and the sample rows are used, so we stream the file until we have them,
+        # or until max_bytes for files with very long lines or that aren't CSV at all
+        raw_content = bytearray()
+        # Lines may end with \n, \r\n or a bare \r, counting both characters covers the three
+        line_feeds = carriage_returns = 0
+        with SESSION.get(access_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size):
+                raw_content += chunk
+                line_feeds += chunk.count(b"\n")
+                carriage_returns += chunk.count(b"\r")
+                if max(line_feeds, carriage_returns) > self.SAMPLE_ROWS + 1 or len(raw_content) >= max_bytes:
+                    # The last line may be cut in the middle, we drop it
+                    last_line_end = max(raw_content.rfind(b"\n"), raw_content.rfind(b"\r"))
+                    if last_line_end >= 0:
+                        del raw_content[last_line_end + 1 :]
+                    break
+
+        content = self.decode_content(bytes(raw_content))
+
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
 
         return self.parse_csv_content(content, identifier)
 
@@ -323,9 +476,9 @@ class CSVImporter(FormatImporter):
 
         # Analyze each column
         for i, header in enumerate(headers):
-            column_values = [row[i] if i < len(row) else "" for row in rows[:50]]
+            column_values = [row[i] if i < len(row) else "" for row in rows[: self.SAMPLE_ROWS]]
             prop_name = self.clean_property_name(header)
-            is_year = any(keyword in prop_name.lower() for keyword in self.YEAR_KEYWORDS)
+            is_year = self.is_year_name(prop_name)
             datatype = "gYear" if is_year else self.infer_datatype(column_values)
 
             data["properties"].append({"name": prop_name, "labels": {"en": header}, "datatype": datatype})
@@ -334,18 +487,11 @@ class CSVImporter(FormatImporter):
 
     def clean_property_name(self, name: str) -> str:
         """Convert to camelCase property name"""
-        name = re.sub(r"[^\w\s]", "", str(name))
-        words = name.split()
-        if not words:
-            return "column"
-
-        result = words[0].lower()
-        for word in words[1:]:
-            result += word.capitalize()
-
-        return result or "column"
+        return _camel_case(str(name), "column")
 
     def is_date(self, value: str) -> bool:
+        if not _DATE_SHAPE_RE.fullmatch(value):
+            return False
         for fmt in self.DATE_FORMATS:
             try:
                 datetime.datetime.strptime(value, fmt)
@@ -355,25 +501,49 @@ class CSVImporter(FormatImporter):
         return False
 
     def infer_datatype(self, values: List[str]) -> str:
-        """Infer datatype from values"""
-        non_empty = [v.strip().lower() for v in values if v.strip()]
-        if not non_empty:
+        """Infer datatype from values in a single pass, stopping as soon as only string is left"""
+        is_boolean = is_number = is_integer = is_date = True
+        has_values = False
+        booleans = self.BOOLEAN_VALUES
+
+        for value in values:
+            value = value.strip()
+            if not value:
+                continue
+            has_values = True
+            value = value.lower()
+
+            if is_boolean and value not in booleans:
+                is_boolean = False
+
+            if is_number:
+                # Matching a regex avoids raising and catching a ValueError for every non numeric column
+                match = _NUMBER_RE.fullmatch(value)
+                if match is None:
+                    is_number = False
+                elif is_integer:
+                    if match.group(2):
+                        # With an exponent, only the value tells whether it is whole (e.g. 1.5e3)
+                        is_integer = float(value.replace(",", ".")).is_integer()
+                    # Decimals with only zeros after the separator (e.g. 2.0) are integers
+                    elif match.group(1) and match.group(1).strip("0"):
+                        is_integer = False
+
+            # Booleans and numbers are never dates, strptime only runs once both are ruled out
+            if is_date:
+                is_date = not (is_boolean or is_number) and self.is_date(value)
+
+            if not (is_boolean or is_number or is_date):
+                return "string"
+
+        if not has_values:
             return "string"
-
-        if all(v in self.BOOLEAN_TRUE or v in self.BOOLEAN_FALSE for v in non_empty):
+        if is_boolean:
             return "boolean"
-
-        try:
-            float_values = [float(v.replace(',', '.')) for v in non_empty]
-            if all(f.is_integer() for f in float_values):
-                return "integer"
-            return "decimal"
-        except ValueError:
-            pass
-
-        if all(self.is_date(v) for v in non_empty):
+        if is_number:
+            return "integer" if is_integer else "decimal"
+        if is_date:
             return "date"
-
         return "string"
 
 
@@ -387,10 +557,16 @@ IMPORTERS = {
 }
 
 
+@functools.lru_cache(maxsize=None)
+def _get_importer(importer_class: type) -> FormatImporter:
+    """Importers hold no state, so one instance per class is shared by all distributions and threads"""
+    return importer_class()
+
+
 def get_suitable_importer(distribution: Dict):
     """Find the right importer for a distribution"""
     for name, importer_class in IMPORTERS.items():
-        importer = importer_class()
+        importer = _get_importer(importer_class)
         if importer.can_process(distribution):
             return importer, name
     return None, None
@@ -1,6 +1,6 @@
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-from common import CommonI14YAPI, reauth_if_token_expired
+from common import CommonI14YAPI, api_params_from_env, reauth_if_token_expired
 from config import *
 from dcat_properties_utils import *
 from rdflib import Graph
@@ -12,12 +12,9 @@ import time
 from dateutil import parser
 from typing import Dict, Any, List
 import datetime
-import urllib3
 import traceback
 from structure_importer import StructureImporter
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 
 class HarvesterOFS(CommonI14YAPI):
 
@@ -41,17 +38,13 @@ class HarvesterOFS(CommonI14YAPI):
 
         while has_more:
 
-            headers = {"User-Agent": I14Y_USER_AGENT}
-
             params = {"skip": skip, "limit": limit}
             for attempt in range(1, 4):
                 try:
                     response = self.session.get(
                         API_OFS_URL,
                         params=params,
-                        verify=False,
                         timeout=30,
-                        headers=headers,
                     )
                     if 500 <= response.status_code < 600:
                         if attempt == 3:
@@ -143,9 +136,7 @@ class HarvesterOFS(CommonI14YAPI):
                     "Content-Type": "application/json",
                     "Accept": "*/*",
                     "Accept-encoding": "json",
-                    "User-Agent": I14Y_USER_AGENT,
                 },
-                verify=False,
             )
             response.raise_for_status()
         except requests.HTTPError as e:
@@ -165,9 +156,7 @@ class HarvesterOFS(CommonI14YAPI):
                     "Content-Type": "application/json",
                     "Accept": "*/*",
                     "Accept-encoding": "json",
-                    "User-Agent": I14Y_USER_AGENT,
                 },
-                verify=False,
             )
             response.raise_for_status()
         except requests.HTTPError as e:
@@ -180,10 +169,9 @@ class HarvesterOFS(CommonI14YAPI):
         headers = {
             "Authorization": self.api_token,
             "Content-Type": "application/json",
-            "User-Agent": I14Y_USER_AGENT,
         }
         url = f"{self.api_base_url}/datasets/{dataset_id}"
-        response = self.session.delete(url, headers=headers, verify=False)
+        response = self.session.delete(url, headers=headers)
         response.raise_for_status()
 
         return response
@@ -204,7 +192,6 @@ class HarvesterOFS(CommonI14YAPI):
         headers = {
             "Authorization": self.api_token,
             "Content-Type": "application/json",
-            "User-Agent": I14Y_USER_AGENT,
         }
 
         action = "created"
@@ -349,15 +336,16 @@ class HarvesterOFS(CommonI14YAPI):
                 dataset_id = result["dataset_id"]
                 dataset_status_identifier_id_map["deleted"][identifier] = dataset_id
 
-        log = f"Harvest completed successfully at {datetime.datetime.now()}\n"
-        for action in ["created", "updated", "unchanged", "deleted"]:
-            log += f"\n{action.capitalize()} datasets: {len(dataset_status_identifier_id_map[action])}"
-            for bfs_identifier, i14y_id in dataset_status_identifier_id_map[action].items():
-                log += f"\n- {bfs_identifier} : {i14y_id}"
-
+        # Each section is streamed to the log file instead of building the whole log in memory
         log_path = os.path.join(os.getcwd(), "harvest_log.txt")
         with open(log_path, "w") as f:
-            f.write(log)
+            f.write(f"Harvest completed successfully at {datetime.datetime.now()}\n")
+            for action in ["created", "updated", "unchanged", "deleted"]:
+                f.write(f"\n{action.capitalize()} datasets: {len(dataset_status_identifier_id_map[action])}")
+                f.writelines(
+                    f"\n- {bfs_identifier} : {i14y_id}"
+                    for bfs_identifier, i14y_id in dataset_status_identifier_id_map[action].items()
+                )
 
         print("\n=== Import Summary ===")
         print(f"Total processed: {len(datasets)}")
@@ -371,13 +359,7 @@ class HarvesterOFS(CommonI14YAPI):
 
 if __name__ == "__main__":
     # We use the same file for ABN and PROD, therefore we can use env vars passed by github actions to distinguish one from another
-    api_params = {
-        "client_key": os.environ["CLIENT_KEY"],
-        "client_secret": os.environ["CLIENT_SECRET"],
-        "api_get_token_url": os.environ["GET_TOKEN_URL"],
-        "api_base_url": os.environ["API_BASE_URL"],
-        "organization_id": ORGANIZATION_ID,
-    }
+    api_params = api_params_from_env()
 
     harvester = HarvesterOFS(api_params)
     harvester.harvest()
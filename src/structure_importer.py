@@ -5,18 +5,60 @@ Extensible structure importer - works with any format importer
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import os
+import re
 import traceback
-import requests
-import urllib3
-from common import CommonI14YAPI, reauth_if_token_expired
-from datetime import datetime
-from rdflib import Graph, Namespace, RDF, Literal
+from common import CommonI14YAPI, api_params_from_env, reauth_if_token_expired
+from datetime import datetime, timezone
 from rdflib.namespace import SH, RDFS, XSD, DCTERMS
-from typing import Dict, List
-from config import I14Y_USER_AGENT, MAX_WORKERS, ORGANIZATION_ID
+from typing import Dict, Iterator, List
+from config import STRUCTURE_MAX_WORKERS
 from format_importers import get_suitable_importer
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+I14Y_STRUCTURE_NS = "https://www.i14y.admin.ch/resources/datasets/structure/"
+
+TTL_PREFIXES = (
+    f"@prefix dcterms: <{DCTERMS}> .\n"
+    f"@prefix rdfs: <{RDFS}> .\n"
+    f"@prefix sh: <{SH}> .\n"
+    f"@prefix xsd: <{XSD}> .\n"
+)
+
+TTL_DATATYPES = {
+    "string": "xsd:string",
+    "integer": "xsd:integer",
+    "decimal": "xsd:decimal",
+    "gYear": "xsd:gYear",
+    "date": "xsd:date",
+    "boolean": "xsd:boolean",
+}
+
+# Only the IRI, order, datatype and names change between property shapes
+TTL_PROPERTY_SHAPE = (
+    "%s a sh:PropertyShape ;\n"
+    "    sh:path %s ;\n"
+    "    sh:order %d ;\n"
+    "    sh:minCount 1 ;\n"
+    "    sh:maxCount 1 ;\n"
+    "    sh:datatype %s%s .\n"
+)
+
+_TTL_STRING_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+_TTL_IRI_ESCAPE_RE = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+
+def _now_iso() -> str:
+    """Current UTC time as an xsd:dateTime string without timezone, e.g. 2024-01-31T12:00:00"""
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds")
+
+
+def _ttl_iri(iri: str) -> str:
+    """Format an IRI for Turtle, escaping the characters not allowed in an IRIREF"""
+    return "<" + _TTL_IRI_ESCAPE_RE.sub(lambda match: f"\\u{ord(match.group()):04X}", iri) + ">"
+
+
+def _ttl_literal_list(values: Dict[str, str]) -> str:
+    """Format a lang -> text dict as a Turtle object list of language-tagged literals"""
+    return ", ".join(f'"{str(value).translate(_TTL_STRING_ESCAPES)}"@{lang}' for lang, value in values.items())
 
 
 class StructureImporter(CommonI14YAPI):
@@ -46,6 +88,8 @@ class StructureImporter(CommonI14YAPI):
         """
         super().__init__(api_params)
         self.identifier_dataset_map = {}
+        # Timestamp shared by all the structures of an import run, set by run_import
+        self._batch_timestamp = None
 
     def create_datasets_to_process(self) -> Dict[str, str]:
         """
@@ -66,89 +110,58 @@ class StructureImporter(CommonI14YAPI):
 
         return datasets_to_process
 
-    def create_shacl_graph(self, metadata: Dict) -> str:
-        """Create SHACL graph from metadata (format-agnostic)"""
-        g = Graph()
-
-        # Namespaces
-        SH_NS = SH
-        DCTERMS_NS = DCTERMS
-        RDFS_NS = RDFS
-        XSD_NS = XSD
-        I14Y_NS = Namespace("https://www.i14y.admin.ch/resources/datasets/structure/")
-
-        g.bind("sh", SH_NS)
-        g.bind("dcterms", DCTERMS_NS)
-        g.bind("rdfs", RDFS_NS)
-        g.bind("xsd", XSD_NS)
-        g.bind("i14y", I14Y_NS)
-
-        # Create main shape
-        shape_name = f"{metadata['identifier']}Shape"
-        shape_uri = I14Y_NS[shape_name]
-
-        g.add((shape_uri, RDF.type, SH_NS.NodeShape))
-
-        # Add titles
-        for lang, title in metadata["title"].items():
-            g.add((shape_uri, RDFS_NS.label, Literal(title, lang=lang)))
-
-        # Add descriptions
-        for lang, desc in metadata["description"].items():
-            g.add((shape_uri, DCTERMS_NS.description, Literal(desc, lang=lang)))
-
-        # Add timestamps
-        now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
-        g.add((shape_uri, DCTERMS_NS.created, Literal(now, datatype=XSD_NS.dateTime)))
-        g.add((shape_uri, DCTERMS_NS.modified, Literal(now, datatype=XSD_NS.dateTime)))
-
-        g.add((shape_uri, SH_NS.closed, Literal(True)))
-
-        # Add properties
-        for i, prop in enumerate(metadata["properties"]):
-            prop_uri = I14Y_NS[f"{shape_name}/{prop['name']}"]
-
-            g.add((prop_uri, RDF.type, SH_NS.PropertyShape))
-            g.add((shape_uri, SH_NS.property, prop_uri))
-            g.add((prop_uri, SH_NS.path, prop_uri))
-            g.add((prop_uri, SH_NS.order, Literal(i)))
-            g.add((prop_uri, SH_NS.minCount, Literal(1)))
-            g.add((prop_uri, SH_NS.maxCount, Literal(1)))
-
-            # Set datatype
-            datatype_map = {
-                "string": XSD_NS.string,
-                "integer": XSD_NS.integer,
-                "decimal": XSD_NS.decimal,
-                "gYear": XSD_NS.gYear,
-                "date": XSD_NS.date,
-                "boolean": XSD_NS.boolean,
-            }
-            datatype = datatype_map.get(prop["datatype"], XSD_NS.string)
-            g.add((prop_uri, SH_NS.datatype, datatype))
+    def create_shacl_graph(self, metadata: Dict) -> bytes:
+        """Create SHACL graph from metadata (format-agnostic), as UTF-8 Turtle ready to be uploaded"""
+        return self._emit_turtle(metadata).encode("utf-8")
+
+    def _emit_turtle(self, metadata: Dict) -> str:
+        """Write the SHACL shape directly as Turtle, the shape is fixed so we don't need rdflib's generic serializer"""
+        shape_uri = f"{I14Y_STRUCTURE_NS}{metadata['identifier']}Shape"
+        shape_iri = _ttl_iri(shape_uri)
+        now = self._batch_timestamp or _now_iso()
+
+        # Property IRIs share the shape prefix, it is built once instead of per property
+        property_prefix = shape_uri + "/"
+        property_iris = [_ttl_iri(property_prefix + prop["name"]) for prop in metadata["properties"]]
 
-            # Add multilingual names
-            for lang, label in prop["labels"].items():
-                g.add((prop_uri, SH_NS.name, Literal(label, lang=lang)))
+        shape_statements = ["a sh:NodeShape"]
+        if metadata["title"]:
+            shape_statements.append("rdfs:label " + _ttl_literal_list(metadata["title"]))
+        if metadata["description"]:
+            shape_statements.append("dcterms:description " + _ttl_literal_list(metadata["description"]))
+        shape_statements.append(f'dcterms:created "{now}"^^xsd:dateTime')
+        shape_statements.append(f'dcterms:modified "{now}"^^xsd:dateTime')
+        shape_statements.append("sh:closed true")
+        if property_iris:
+            shape_statements.append("sh:property " + ", ".join(property_iris))
 
-        return g.serialize(format="turtle")
+        blocks = [TTL_PREFIXES, f"{shape_iri} " + " ;\n    ".join(shape_statements) + " .\n"]
+
+        # Bound once, they are used for every property
+        add_block = blocks.append
+        get_datatype = TTL_DATATYPES.get
+        property_template = TTL_PROPERTY_SHAPE
+
+        for i, (prop, prop_iri) in enumerate(zip(metadata["properties"], property_iris)):
+            names = " ;\n    sh:name " + _ttl_literal_list(prop["labels"]) if prop["labels"] else ""
+            add_block(property_template % (prop_iri, prop_iri, i, get_datatype(prop["datatype"], "xsd:string"), names))
+
+        return "\n".join(blocks)
 
     @reauth_if_token_expired
-    def upload_structure(self, dataset_id: str, turtle_data: str) -> bool:
+    def upload_structure(self, dataset_id: str, turtle_data: bytes) -> bool:
         """Upload SHACL structure to API"""
         headers = {
             "Authorization": self.api_token,
-            "User-Agent": I14Y_USER_AGENT,
             # Remove Content-Type header; requests will set it automatically for multipart/form-data
         }
 
         url = f"{self.api_base_url}/datasets/{dataset_id}/structures/imports"
 
-        # Prepare the file for multipart upload
+        # Prepare the file for multipart upload, turtle_data is already encoded so requests sends it as is
         files = {"file": ("structure.ttl", turtle_data, "text/turtle")}
 
-        print(f"Uploading structure to {url}...")
-        response = self.session.post(url, headers=headers, files=files, verify=False, timeout=30)
+        response = self.session.post(url, headers=headers, files=files, timeout=30)
         response.raise_for_status()
 
         if response.status_code in {200, 201, 204}:
@@ -161,12 +174,11 @@ class StructureImporter(CommonI14YAPI):
         headers = {
             "Authorization": self.api_token,
             "Content-Type": "application/json",
-            "User-Agent": I14Y_USER_AGENT,
         }
 
         url = f"{self.api_base_url}/datasets/{dataset_id}/structures"
 
-        response = self.session.delete(url, headers=headers, verify=False, timeout=30)
+        response = self.session.delete(url, headers=headers, timeout=30)
         response.raise_for_status()
         if response.status_code in {200, 204}:
             print(f"Structure for dataset {dataset_id} deleted successfully.")
@@ -180,42 +192,33 @@ class StructureImporter(CommonI14YAPI):
 
     def build_identifier_dataset_map(self) -> Dict:
         """Builds a id->dataset map with fetched datasets for current organization"""
-        identifier_dataset_map = {}
+        # get_all_existing_datasets only returns datasets whose first identifier is a bfs identifier
         all_existing_datasets = self.get_all_existing_datasets(self.organization)
-        for dataset in all_existing_datasets:
-            bfs_identifier = dataset["identifiers"][0]
-            if self.bfs_identifier_pattern.match(bfs_identifier):
-                identifier_dataset_map[bfs_identifier] = dataset
-        return identifier_dataset_map
-
-    def find_processable_distributions(self, distributions: List[Dict]) -> List[tuple]:
-        """Find distributions that can be processed and deduplicate"""
-        processable = []
-        seen_identifiers = set()
+        return {dataset["identifiers"][0]: dataset for dataset in all_existing_datasets}
 
-        # print(f"DEBUG distributions: {distributions}")
+    def iter_processable_distributions(self, distributions: List[Dict]) -> Iterator[tuple]:
+        """Yield distributions that can be processed, deduplicated, so that callers can stop at the first ones"""
+        seen_identifiers = set()
+        add_seen = seen_identifiers.add
 
         for dist in distributions:
             importer, format_name = get_suitable_importer(dist)
+            if not importer:
+                continue
 
-            # print(f"DEBUG importer: {importer}, format_name: {format_name}")
-
-            if importer:
-                identifier = importer.get_identifier(dist)
-                print(f"identifier: {identifier}")
-                print(f"Identifier type: {type(identifier)}, value: {identifier}")
-
-                # Ensure identifier is a string
-                if isinstance(identifier, str):
-                    identifier_lower = identifier.lower()
-                    if identifier_lower not in seen_identifiers:
-                        processable.append((dist, importer, format_name, identifier))
-                        seen_identifiers.add(identifier_lower)
-                    else:
-                        print(f"\tSkipping duplicate {format_name} file: {identifier}")
-                else:
-                    print(f"\tInvalid identifier (not a string): {identifier}")
-        return processable
+            identifier = importer.get_identifier(dist)
+
+            # Ensure identifier is a string
+            if not isinstance(identifier, str):
+                print(f"\tInvalid identifier (not a string): {identifier}")
+                continue
+
+            key = identifier.casefold()
+            if key in seen_identifiers:
+                print(f"\tSkipping duplicate {format_name} file: {identifier}")
+                continue
+            add_seen(key)
+            yield dist, importer, format_name, identifier
 
     def _process_one_structure_job(self, bfs_identifier: str, dataset_id: str) -> Dict[str, str]:
         """
@@ -250,23 +253,25 @@ class StructureImporter(CommonI14YAPI):
             print(f"\tNo distributions found")
             return False
 
-        # Find processable distributions (with deduplication)
-        processable = self.find_processable_distributions(distributions)
-        if not processable:
+        # Find processable distributions (with deduplication), only the first one is processed
+        processable = self.iter_processable_distributions(distributions)
+        first = next(processable, None)
+        if first is None:
             print(f"\tNo supported file formats found")
             return False
 
         # Process first suitable distribution
-        dist, importer, format_name, file_id = processable[0]
+        dist, importer, format_name, file_id = first
 
-        if format_name == "csv" and len(processable) > 1:
+        # A second processable distribution is only looked for when it matters
+        if format_name == "csv" and next(processable, None) is not None:
             print(f"\tMore than 1 csv file detected, skipping file_id: {file_id}")
             return False
 
         print(f"\tProcessing {format_name} file: {file_id}")
 
         # Download and parse file
-        metadata = importer.download_and_parse(dist)
+        metadata = importer.download_and_parse(dist, identifier=file_id)
 
         # Create and upload SHACL
         turtle_data = self.create_shacl_graph(metadata)
@@ -278,7 +283,9 @@ class StructureImporter(CommonI14YAPI):
         else:
             return False
 
-    def run_import(self, datasets_to_process: Dict[str, str], import_all: bool = False):
+    def run_import(
+        self, datasets_to_process: Dict[str, str], import_all: bool = False, max_workers: int = STRUCTURE_MAX_WORKERS
+    ):
         """
         Main import process with harvest log awareness.
 
@@ -286,6 +293,7 @@ class StructureImporter(CommonI14YAPI):
             datasets_to_process Dict[str,str]: Bfs identifier -> i14y id map for datasets to process (those created or updated by harvester)
             import_all (bool):  if True we import structures for all the datasets and not only those updated and created by the harvester (useful for first run)
                                 if False we import structures only for datasets updated or created by the harvester
+            max_workers (int): number of datasets processed in parallel
         """
         # Statistics
         created_structure_datasets = []
@@ -293,6 +301,7 @@ class StructureImporter(CommonI14YAPI):
         error_structure_datasets = []
 
         print("Starting extensible structure import...")
+        self._batch_timestamp = _now_iso()
         self.identifier_dataset_map = self.build_identifier_dataset_map()
 
         dataset_to_process_identifier_data_map = {}
@@ -313,7 +322,7 @@ class StructureImporter(CommonI14YAPI):
                 continue
             jobs.append((bfs_identifier, dataset_id))
 
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = [
                 executor.submit(self._process_one_structure_job, bfs_identifier, dataset_id)
                 for bfs_identifier, dataset_id in jobs
@@ -344,21 +353,15 @@ class StructureImporter(CommonI14YAPI):
         print(f"Skipped: {skipped}")
         print(f"Errors: {errors}")
 
-        # Save log
-        log_content = f"Structure import completed at {datetime.now()}"
-        log_content += f"\nResults:\n"
-        log_content += f"\nStructures created: {created_structures}"
-        for x in created_structure_datasets:
-            log_content += f"\n- {x}"
-        log_content += f"\nSkipped: {skipped}"
-        for x in skipped_structure_datasets:
-            log_content += f"\n- {x}"
-        log_content += f"\nErrors: {errors}"
-        for x in error_structure_datasets:
-            log_content += f"\n- {x}"
-
+        # Save log, each section is streamed to the file instead of building the whole log in memory
         with open("structure_import_log.txt", "w") as f:
-            f.write(log_content)
+            f.write(f"Structure import completed at {datetime.now()}\nResults:\n")
+            f.write(f"\nStructures created: {created_structures}")
+            f.writelines(f"\n- {x}" for x in created_structure_datasets)
+            f.write(f"\nSkipped: {skipped}")
+            f.writelines(f"\n- {x}" for x in skipped_structure_datasets)
+            f.write(f"\nErrors: {errors}")
+            f.writelines(f"\n- {x}" for x in error_structure_datasets)
 
         print("Log saved to structure_import_log.txt")
 
@@ -367,13 +370,7 @@ class StructureImporter(CommonI14YAPI):
 
 
 if __name__ == "__main__":
-    api_params = {
-        "client_key": os.environ["CLIENT_KEY"],
-        "client_secret": os.environ["CLIENT_SECRET"],
-        "api_get_token_url": os.environ["GET_TOKEN_URL"],
-        "api_base_url": os.environ["API_BASE_URL"],
-        "organization_id": ORGANIZATION_ID,
-    }
+    api_params = api_params_from_env()
 
     import_all = os.environ.get("IMPORT_ALL", "False") == "True"
 